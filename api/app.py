@@ -1,22 +1,63 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import xgboost as xgb
-import pandas as pd
+import numpy as np
 import os
+import shutil
+import tempfile
 import uvicorn
-import openai
 import json
-from sqlalchemy import create_engine, text
+import time
+import threading
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+from batcher import PredictBatcher
+from intent import IntentParser, IntentStats
+from context import build_context, estimate_tokens, PromptStats
+from comparables import ComparablesIndex
 
 load_dotenv()
 
+# pandas, openai and sqlalchemy are imported inside the functions that need them, so the
+# /bto_price path (numpy + xgboost only) starts fast and stays small. see bench/startup.py
+
 model = None
 town_mapping = {}
 flat_type_mapping = {}
 
+# threads each xgboost predict may use, 0 = xgboost default (every core)
+PREDICT_THREADS = int(os.getenv("PREDICT_THREADS", "0"))
+
+# /bto_price micro-batching, BATCH_WINDOW_MS=0 scores every request on its own
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "2"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "64"))
+
+# parse explicit chat queries locally instead of spending an llm call on the intent JSON
+INTENT_FAST_PATH = os.getenv("INTENT_FAST_PATH", "1") == "1"
+
+# rough token budget for the system context (prompt + analysis data) of the final chat call
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+# build the /comparables index on its first request instead of at startup
+LEAN_SERVING = os.getenv("LEAN_SERVING", "0") == "1"
+
+# /comparables index: years of recent sales kept, and how often to check the db for changes
+COMPARABLES_YEARS = int(os.getenv("COMPARABLES_YEARS", "3"))
+COMPARABLES_REFRESH_S = float(os.getenv("COMPARABLES_REFRESH_S", "300"))
+# after a failed build, /comparables returns 503 for this long before trying again
+COMPARABLES_RETRY_S = float(os.getenv("COMPARABLES_RETRY_S", "60"))
+# where the refreshing worker writes index snapshots for the others to memory-map
+COMPARABLES_SNAPSHOT_DIR = os.getenv("COMPARABLES_SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "hdb-comparables"))
+
+# rows encoded and predicted per chunk by /bto_price/bulk
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "10000"))
+
+FEATURES = ["storey_median", "floor_area_sqm", "remaining_lease", "town_enc", "flat_type_enc"]
+MAPPINGS_PATH = os.path.join("model", "xgb_mappings.json")
+
 class PredictRequest(BaseModel):
     storey_median: int
     floor_area_sqm: int
@@ -24,43 +65,77 @@ class PredictRequest(BaseModel):
     town: str
     flat_type: str
 
-def predict_price(data: PredictRequest) -> float:
+def encode_features(data: PredictRequest) -> list:
     town_enc = town_mapping.get(data.town.upper())
     flat_type_enc = flat_type_mapping.get(data.flat_type.upper())
+    if town_enc is None:
+        print(f"Unknown town: {data.town}")
+        raise HTTPException(400, f"Unknown town")
+    if flat_type_enc is None:
+        print(f"Unknown flat type: {data.flat_type}")
+        raise HTTPException(400, f"Unknown flat type")
+    return [data.storey_median, data.floor_area_sqm, data.remaining_lease, town_enc, flat_type_enc]
+
+def predict_rows(rows: np.ndarray) -> np.ndarray:
+    return model.predict(xgb.DMatrix(rows, feature_names=FEATURES))
+
+def predict_price(data: PredictRequest) -> float:
     try:
-        if town_enc is None:
-            print(f"Unknown town: {data.town}")
-            raise HTTPException(400, f"Unknown town")
-        if flat_type_enc is None:
-            print(f"Unknown flat type: {data.flat_type}")
-            raise HTTPException(400, f"Unknown flat type")
-        
-        features_dict = {
-            'storey_median': [data.storey_median],
-            'floor_area_sqm': [data.floor_area_sqm],
-            'remaining_lease': [data.remaining_lease],
-            'town_enc': [town_enc],
-            'flat_type_enc': [flat_type_enc]
-        }
-        df = pd.DataFrame(features_dict)
-        dmatrix = xgb.DMatrix(df)
-        price = model.predict(dmatrix)[0]
+        features = np.asarray([encode_features(data)], dtype=np.float32)
+        price = predict_rows(features)[0]
 
         return float(price)
     except Exception as e:
         print(f"pred error: {str(e)}")
         raise 
 
+def get_engine():
+    from sqlalchemy import create_engine
+    return create_engine(os.getenv("DATABASE_URL"))
+
+def load_mappings() -> tuple:
+    # written next to the model by model/train-xgb.py, so startup doesn't need the db
+    if os.path.exists(MAPPINGS_PATH):
+        with open(MAPPINGS_PATH, "r") as f:
+            mappings = json.load(f)
+        return mappings["town"], mappings["flat_type"]
+
+    # models trained before the mappings file existed
+    from sqlalchemy import text
+    eng = get_engine()
+    with eng.connect() as c:
+        towns = c.execute(text("SELECT DISTINCT town, town_enc FROM transactions_clean")).fetchall()
+        flats = c.execute(text("SELECT DISTINCT flat_type, flat_type_enc FROM transactions_clean")).fetchall()
+    eng.dispose()  # no open connections should be inherited by forked workers
+    return dict(towns), dict(flats)
+
 class HDBLLMService:
     def __init__(self):
-        self.client = openai.OpenAI(
-            api_key=os.getenv("OPENROUTER_API_KEY"),
-            base_url="https://openrouter.ai/api/v1"
-        )
         self.model = "deepseek/deepseek-r1"
-        self.engine = create_engine(os.getenv("DATABASE_URL"))
+        self._client = None
+        self._engine = None
+        self.intent_parser = IntentParser(town_mapping, flat_type_mapping) if INTENT_FAST_PATH else None
+        self.intent_stats = IntentStats()
+        self.prompt_stats = PromptStats()
+
+    @property
+    def client(self):
+        if self._client is None:
+            import openai
+            self._client = openai.OpenAI(
+                api_key=os.getenv("OPENROUTER_API_KEY"),
+                base_url=os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")  # bench/fake-llm.py for offline runs
+            )
+        return self._client
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = get_engine()
+        return self._engine
     
     def get_bto_recommendations(self, years: int = 10) -> dict:
+        from sqlalchemy import text
         with self.engine.connect() as c:
             query = text(f"""
             SELECT town, 
@@ -130,7 +205,14 @@ class HDBLLMService:
             "income_category": category
         }
     
-    def chat(self, user_prompt: str) -> str:
+    def analyse(self, user_prompt: str) -> dict:
+        start = time.perf_counter()
+        needs = self.intent_parser.parse(user_prompt) if self.intent_parser else None
+        if needs is not None:
+            self.intent_stats.record(True, time.perf_counter() - start)
+            print(f"intent fast path: {needs}")
+            return needs
+
         analysis_prompt = f"""
 You are a Singapore HDB housing analyst. Analyse this user query step by step:
 
@@ -189,22 +271,26 @@ Now analyse the user query above:
             temperature=0.1,
             max_completion_tokens=1500
         )
+        self.intent_stats.record(False, time.perf_counter() - start)
         
+        print(analysis_response.choices[0].message.content)
+        print(repr(analysis_response.choices[0].message.content))
+        analysis = json.loads(analysis_response.choices[0].message.content)
+        print(analysis)
+        return analysis
+
+    def chat(self, user_prompt: str) -> str:
         try:
-            print(analysis_response.choices[0].message.content)
-            print(repr(analysis_response.choices[0].message.content))
-            analysis = json.loads(analysis_response.choices[0].message.content)
-            print(analysis)
-            needs = analysis
+            needs = self.analyse(user_prompt)
         except Exception as e:
             return {"error": str(e), "success": False}
         
-        function_results = []
+        recommendations = None
+        predictions = []
         recommended_towns = []
         if needs.get("needs_recommendations", False):
             years = needs.get("years", 10)
             recommendations = self.get_bto_recommendations(years)
-            function_results.append(f"BTO Recommendations:\n{json.dumps(recommendations, indent=2)}")
             recommended_towns = [rec["town"] for rec in recommendations.get("recommendations", [])]
         
         if needs.get("needs_prediction", False):
@@ -235,17 +321,20 @@ Now analyse the user query above:
                             storey_median=storey_median
                         )
                         
-                        prediction["scenario"] = f"{flat_type} in {town}- {floor_level}"
-                        function_results.append(f"BTO Price Analysis:\n{json.dumps(prediction, indent=2)}")
+                        prediction.setdefault("town", town)
+                        prediction.setdefault("flat_type", flat_type)
+                        prediction["floor_level"] = floor_level
                         
                         if prediction.get("success") and "predicted_bto_price" in prediction:
+                            # same row as the prediction so the context builder doesn't repeat price and scenario
                             affordability = self.calculate_affordability(prediction["predicted_bto_price"])
-                            affordability["scenario"] = f"Affordability for {prediction['scenario']}"
-                            function_results.append(f"Affordability:\n{json.dumps(affordability, indent=2)}")
+                            del affordability["price"]
+                            prediction.update(affordability)
+                        predictions.append(prediction)
         
-        has_recommendations = any("BTO Recommendations" in result for result in function_results)
-        has_prices = any("BTO Price Analysis" in result for result in function_results)
-        has_affordability = any("Affordability" in result for result in function_results)
+        has_recommendations = recommendations is not None
+        has_prices = bool(predictions)
+        has_affordability = any("required_monthly_income" in p for p in predictions)
 
         if has_recommendations and has_prices and has_affordability:
             system_prompt = """Create a CONCISE analysis (max 250 words) with these sections:
@@ -284,10 +373,7 @@ Use specific data provided. Be direct and actionable."""
         else:
             system_prompt = """Provide general BTO guidance in under 100 words. Be helpful and actionable."""
 
-        if function_results:
-            context = f"{system_prompt}\n\nAnalysis data:\n{chr(10).join(function_results)}"
-        else:
-            context = system_prompt
+        context = build_context(system_prompt, recommendations, predictions, CONTEXT_TOKEN_BUDGET)
         
         final_response = self.client.chat.completions.create(
             model=self.model,
@@ -298,30 +384,87 @@ Use specific data provided. Be direct and actionable."""
             temperature=0.7,
             max_completion_tokens=1500
         )
+
+        usage = getattr(final_response, "usage", None)
+        prompt_tokens = usage.prompt_tokens if usage and usage.prompt_tokens else estimate_tokens(context + user_prompt)
+        self.prompt_stats.record(prompt_tokens)
+        print(f"final prompt tokens: {prompt_tokens} ({len(predictions)} predictions)")
         
         return final_response.choices[0].message.content
 
 llm_service = None
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+batcher = None
+comparables_index = None
+comparables_lock = threading.Lock()
+comparables_failed_at = None
+
+def load_comparables(start_refresh: bool = False, blocking: bool = True):
+    # kept out of load_resources so a db problem only takes down /comparables (503),
+    # not /bto_price or api/bulk-price.py
+    global comparables_index, comparables_failed_at
+    if comparables_index is not None:
+        return comparables_index
+    if comparables_failed_at and time.time() - comparables_failed_at < COMPARABLES_RETRY_S:
+        return None
+    # requests don't queue up behind a build that is already running
+    if not comparables_lock.acquire(blocking=blocking):
+        return None
+    try:
+        if comparables_index is None:
+            try:
+                index = ComparablesIndex(os.getenv("DATABASE_URL"), COMPARABLES_YEARS,
+                                         COMPARABLES_REFRESH_S, COMPARABLES_SNAPSHOT_DIR)
+                index.build()
+                index.engine.dispose()
+            except Exception as e:
+                comparables_failed_at = time.time()
+                print(f"comparables index build failed, retrying in {COMPARABLES_RETRY_S:.0f}s: {str(e)}")
+                return None
+            comparables_failed_at = None
+            if start_refresh:
+                index.start_refresh()
+            comparables_index = index
+    finally:
+        comparables_lock.release()
+    return comparables_index
+
+def load_resources():
+    # loads the booster, mappings and llm service once per process. api/gunicorn.conf.py
+    # calls this in the master before forking so workers share them copy-on-write
     global model, town_mapping, flat_type_mapping, llm_service
+    if model is not None:
+        return
+
+    booster = xgb.Booster()
+    booster.load_model("model/xgb_model.json")
+    if PREDICT_THREADS:
+        booster.set_param({"nthread": PREDICT_THREADS})
     
-    model = xgb.Booster()
-    model.load_model("model/xgb_model.json")
-    
-    eng = create_engine(os.getenv("DATABASE_URL"))
-    
-    towns = pd.read_sql("SELECT DISTINCT town, town_enc FROM transactions_clean", eng)
-    town_mapping = dict(zip(towns['town'], towns['town_enc']))
-    
-    flats = pd.read_sql("SELECT DISTINCT flat_type, flat_type_enc FROM transactions_clean", eng)
-    flat_type_mapping = dict(zip(flats['flat_type'], flats['flat_type_enc']))
-    
+    town_mapping, flat_type_mapping = load_mappings()
     llm_service = HDBLLMService()
-    
+    model = booster
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global batcher
+    load_resources()
+
+    # started per worker, after the fork, since it lives on the worker's event loop
+    if BATCH_WINDOW_MS > 0:
+        batcher = PredictBatcher(predict_rows, BATCH_WINDOW_MS, BATCH_MAX_SIZE)
+        batcher.start()
+
+    # under gunicorn the master already built it in when_ready, this only starts the refresh
+    if not LEAN_SERVING:
+        load_comparables()
+    if comparables_index:
+        comparables_index.start_refresh()
+
     yield
 
+    if batcher:
+        await batcher.stop()
+
 app = FastAPI(title="HDB BTO Price Prediction API", version="1.0.0", lifespan=lifespan)
 
 @app.get("/")
@@ -335,14 +478,26 @@ def health_check():
         "model_loaded": model is not None,
     }
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "batcher": batcher.stats() if batcher else None,
+        "intent": llm_service.intent_stats.report() if llm_service else None,
+        "chat_prompt": llm_service.prompt_stats.report() if llm_service else None,
+        "comparables": comparables_index.stats() if comparables_index else None,
+    }
+
 @app.post("/bto_price")
-def bto_price(data: PredictRequest, discount: float = 20.0):
+async def bto_price(data: PredictRequest, discount: float = 20.0):
     try:        
         if not model:
             print("Model not loaded")
             raise HTTPException(503, "Model not loaded")
         
-        price = predict_price(data)
+        if batcher:
+            price = await batcher.submit(encode_features(data))
+        else:
+            price = await run_in_threadpool(predict_price, data)
         bto_price = price * (1 - discount/100)
         
         print(f"Prediction successful")
@@ -353,6 +508,64 @@ def bto_price(data: PredictRequest, discount: float = 20.0):
         print(f"Prediction failed")
         raise HTTPException(500, f"Prediction error: {str(e)}")
 
+@app.post("/bto_price/bulk")
+def bto_price_bulk(file: UploadFile = File(...), discount: float = 20.0, chunk_size: int = BULK_CHUNK_SIZE):
+    from bulk import is_parquet, read_chunks, iter_priced_csv  # pulls in pandas
+    if not model:
+        raise HTTPException(503, "Model not loaded")
+
+    # copied to our own temp file on disk since fastapi may close the upload before the
+    # response finishes streaming. only one chunk is in memory at a time
+    tmp = tempfile.TemporaryFile()
+    shutil.copyfileobj(file.file, tmp)
+    tmp.seek(0)
+
+    chunks = read_chunks(tmp, is_parquet(file.filename), chunk_size)
+    try:
+        first = next(chunks, None)  # surfaces unreadable files / missing columns as a 400 before streaming
+    except Exception as e:
+        tmp.close()
+        raise HTTPException(400, f"Invalid file: {str(e)}")
+
+    def with_first():
+        try:
+            if first is not None:
+                yield first
+            yield from chunks
+        finally:
+            tmp.close()
+
+    print(f"Bulk pricing {file.filename}")
+    return StreamingResponse(
+        iter_priced_csv(with_first(), town_mapping, flat_type_mapping, predict_rows, discount),
+        media_type="text/csv",
+        headers={"Content-Disposition": "attachment; filename=priced.csv"},
+    )
+
+@app.post("/comparables")
+def comparables(data: PredictRequest, k: int = Query(5, ge=1, le=50)):
+    if not model:
+        raise HTTPException(503, "Model not loaded")
+    index = comparables_index
+    if index is None:
+        # LEAN_SERVING defers the build (and the db driver import) to the first request, and a
+        # failed startup build is retried here once COMPARABLES_RETRY_S has passed
+        index = load_comparables(start_refresh=True, blocking=False)
+    if index is None:
+        raise HTTPException(503, "Comparables index not loaded")
+    if data.town.upper() not in town_mapping:
+        raise HTTPException(400, "Unknown town")
+    if data.flat_type.upper() not in flat_type_mapping:
+        raise HTTPException(400, "Unknown flat type")
+
+    start = time.perf_counter()
+    sales = index.query(data.town, data.flat_type, data.floor_area_sqm,
+                        data.storey_median, data.remaining_lease, k)
+    return {
+        "comparables": sales,
+        "query_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
 @app.post("/chat")
 async def chat(request: Request):
     if not llm_service:
@@ -0,0 +1,94 @@
+import asyncio
+from collections import deque
+import numpy as np
+
+# queues single-row predictions for up to window_ms (or until max_batch rows are waiting)
+# and scores them with one model call. each caller awaits its own future, so it gets back
+# its own price, or the error if the batch failed
+class PredictBatcher:
+    def __init__(self, predict_rows, window_ms: float = 2.0, max_batch: int = 64):
+        self.predict_rows = predict_rows  # (n, n_features) array -> n prices
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = None
+        self.task = None
+
+        self.batches = 0
+        self.requests = 0
+        self.batch_size_counts = {}
+        self.recent_waits = deque(maxlen=2000)  # seconds from enqueue to dispatch
+        self.recent_sizes = deque(maxlen=2000)
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, row: list) -> float:
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self.queue.put_nowait((row, fut, loop.time()))
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = batch[0][2] + self.window
+            while len(batch) < self.max_batch:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._score(batch, loop)
+
+    async def _score(self, batch, loop):
+        now = loop.time()
+        self.batches += 1
+        self.requests += len(batch)
+        self.batch_size_counts[len(batch)] = self.batch_size_counts.get(len(batch), 0) + 1
+        self.recent_sizes.append(len(batch))
+        self.recent_waits.extend(now - enqueued for _, _, enqueued in batch)
+
+        rows = np.asarray([row for row, _, _ in batch], dtype=np.float32)
+        try:
+            # off the event loop so new requests keep queueing while the model runs
+            prices = await loop.run_in_executor(None, self.predict_rows, rows)
+        except Exception as e:
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, fut, _), price in zip(batch, prices):
+            if not fut.done():  # caller may have disconnected
+                fut.set_result(float(price))
+
+    def stats(self) -> dict:
+        waits_ms = np.asarray(self.recent_waits) * 1000
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0,
+            "batch_size_counts": dict(sorted(self.batch_size_counts.items())),
+            "recent_batch_size_p50": float(np.percentile(self.recent_sizes, 50)) if self.recent_sizes else 0,
+            "recent_batch_size_p95": float(np.percentile(self.recent_sizes, 95)) if self.recent_sizes else 0,
+            "recent_wait_ms_p50": round(float(np.percentile(waits_ms, 50)), 3) if len(waits_ms) else 0,
+            "recent_wait_ms_p95": round(float(np.percentile(waits_ms, 95)), 3) if len(waits_ms) else 0,
+            "recent_wait_ms_max": round(float(waits_ms.max()), 3) if len(waits_ms) else 0,
+        }
@@ -0,0 +1,30 @@
+# prices a CSV or Parquet portfolio of PredictRequest columns without going through the api
+#   python3 api/bulk-price.py portfolio.parquet -o priced.csv
+import sys, argparse
+import app
+from bulk import is_parquet, read_chunks, iter_priced_csv
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("input", help="csv or parquet file with storey_median, floor_area_sqm, remaining_lease, town, flat_type")
+    ap.add_argument("-o", "--output", help="csv to write (default stdout)")
+    ap.add_argument("--discount", type=float, default=20.0)
+    ap.add_argument("--chunk-size", type=int, default=app.BULK_CHUNK_SIZE)
+    args = ap.parse_args()
+
+    app.load_resources()
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        with open(args.input, "rb") as f:
+            chunks = read_chunks(f, is_parquet(args.input), args.chunk_size)
+            for text in iter_priced_csv(chunks, app.town_mapping, app.flat_type_mapping, app.predict_rows, args.discount):
+                out.write(text)
+    finally:
+        if args.output:
+            out.close()
+    if args.output:
+        print(f"priced rows written to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
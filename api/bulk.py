@@ -0,0 +1,94 @@
+# chunked bulk valuation shared by POST /bto_price/bulk and api/bulk-price.py.
+# files are read, encoded and predicted chunk_size rows at a time so memory stays flat
+# whatever the file size, and bad rows get an error column instead of failing the job
+import io, csv
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["storey_median", "floor_area_sqm", "remaining_lease", "town", "flat_type"]
+NUMERIC_COLUMNS = ["storey_median", "floor_area_sqm", "remaining_lease"]
+OUTPUT_COLUMNS = COLUMNS + ["predicted_resale_price", "predicted_bto_price", "error"]
+
+def is_parquet(filename: str) -> bool:
+    return (filename or "").lower().endswith((".parquet", ".pq"))
+
+def read_chunks(f, parquet: bool, chunk_size: int):
+    if parquet:
+        import pyarrow.parquet as pq
+        pf = pq.ParquetFile(f)
+        missing = [c for c in COLUMNS if c not in pf.schema_arrow.names]
+        if missing:
+            raise ValueError(f"missing columns: {', '.join(missing)}")
+        for batch in pf.iter_batches(batch_size=chunk_size, columns=COLUMNS):
+            yield batch.to_pandas()
+    else:
+        yield from read_csv_chunks(f, chunk_size)
+
+def read_csv_chunks(f, chunk_size: int):
+    # csv.reader rather than pd.read_csv: a line with the wrong number of fields (extra
+    # values, an unterminated quote swallowing the rest of the file) becomes an error row
+    # instead of a ParserError halfway through the stream
+    reader = csv.reader(io.TextIOWrapper(f, encoding="utf-8-sig", newline=""))
+    header = [h.strip() for h in next(reader, [])]
+    missing = [c for c in COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+    positions = [header.index(c) for c in COLUMNS]
+
+    rows = []
+    for fields in reader:
+        if not fields:
+            continue
+        values = [fields[i] if i < len(fields) else "" for i in positions]
+        error = "" if len(fields) == len(header) else f"malformed row: expected {len(header)} fields, got {len(fields)}"
+        rows.append(values + [error])
+        if len(rows) == chunk_size:
+            yield pd.DataFrame(rows, columns=COLUMNS + ["error"])
+            rows = []
+    if rows:
+        yield pd.DataFrame(rows, columns=COLUMNS + ["error"])
+
+def price_chunk(chunk: pd.DataFrame, town_mapping: dict, flat_type_mapping: dict,
+                predict_rows, discount: float) -> pd.DataFrame:
+    out = chunk[COLUMNS].copy()
+    # rows the reader already rejected keep their error
+    errors = chunk["error"].astype(object) if "error" in chunk else pd.Series("", index=chunk.index, dtype=object)
+
+    features = {}
+    for col in NUMERIC_COLUMNS:
+        features[col] = pd.to_numeric(chunk[col], errors="coerce")
+        errors[features[col].isna() & (errors == "")] = f"invalid {col}"
+
+    towns = chunk["town"].astype(str).str.strip().str.upper()
+    flat_types = chunk["flat_type"].astype(str).str.strip().str.upper()
+    features["town_enc"] = towns.map(town_mapping)
+    features["flat_type_enc"] = flat_types.map(flat_type_mapping)
+    errors[features["town_enc"].isna() & (errors == "")] = "Unknown town"
+    errors[features["flat_type_enc"].isna() & (errors == "")] = "Unknown flat type"
+
+    valid = (errors == "").to_numpy()
+    resale = np.full(len(chunk), np.nan)
+    if valid.any():
+        rows = np.column_stack([features[c].to_numpy(dtype=np.float32)[valid] for c in
+                                ["storey_median", "floor_area_sqm", "remaining_lease", "town_enc", "flat_type_enc"]])
+        try:
+            resale[valid] = predict_rows(rows)
+        except Exception as e:
+            errors[valid] = f"Prediction error: {str(e)}"
+
+    out["predicted_resale_price"] = np.round(resale, 2)
+    out["predicted_bto_price"] = np.round(resale * (1 - discount/100), 2)
+    out["error"] = errors
+    return out
+
+def iter_priced_csv(chunks, town_mapping: dict, flat_type_mapping: dict, predict_rows, discount: float = 20.0):
+    header = True
+    try:
+        for chunk in chunks:
+            priced = price_chunk(chunk, town_mapping, flat_type_mapping, predict_rows, discount)
+            yield priced.to_csv(index=False, header=header)
+            header = False
+    except Exception as e:
+        # the response is already streaming, so report it as a last row rather than cut the file off
+        last = pd.DataFrame([{"error": f"could not read the rest of the file: {str(e)}"}], columns=OUTPUT_COLUMNS)
+        yield last.to_csv(index=False, header=header)
@@ -0,0 +1,211 @@
+# in-memory comparable sales index. recent transactions are split by (town, flat_type)
+# into numpy arrays sorted on floor area, so a lookup is a binary search for an area
+# window plus a distance over the few rows inside it, no sql on the request path
+import os, json, time, shutil, threading
+import numpy as np
+
+# one "unit" of distance: 10 sqm of floor area ~ 5 storeys ~ 5 years of lease
+AREA_SCALE, STOREY_SCALE, LEASE_SCALE = 10.0, 5.0, 5.0
+
+ROWS_QUERY = """
+SELECT town, flat_type, floor_area_sqm, storey_median, remaining_lease, resale_price,
+       month, block, street_name, storey_range
+FROM transactions_clean
+WHERE resale_price IS NOT NULL
+  AND floor_area_sqm IS NOT NULL
+  AND storey_median IS NOT NULL
+  AND remaining_lease IS NOT NULL
+  AND year > (SELECT MAX(year) FROM transactions_clean) - :years
+"""
+VERSION_QUERY = "SELECT COUNT(*), MAX(_ingested_at) FROM transactions_clean"
+
+ARRAYS = ["area", "storey", "lease", "price", "month", "block", "street", "storey_range"]
+
+class Partition:
+    def __init__(self, arrays: dict):
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def from_rows(cls, rows):
+        rows.sort(key=lambda r: r[0])
+        return cls({
+            "area": np.array([r[0] for r in rows], dtype=np.float32),
+            "storey": np.array([r[1] for r in rows], dtype=np.float32),
+            "lease": np.array([r[2] for r in rows], dtype=np.float32),
+            "price": np.array([r[3] for r in rows], dtype=np.int32),
+            "month": np.array([str(r[4])[:7] for r in rows]),
+            "block": np.array([r[5] or "" for r in rows]),
+            "street": np.array([r[6] or "" for r in rows]),
+            "storey_range": np.array([r[7] or "" for r in rows]),
+        })
+
+    def nearest(self, floor_area: float, storey: float, lease: float, k: int) -> list:
+        n = len(self.area)
+        k = min(k, n)
+        window = AREA_SCALE
+        while True:
+            lo = np.searchsorted(self.area, floor_area - window, "left")
+            hi = np.searchsorted(self.area, floor_area + window, "right")
+            if hi - lo >= k or (lo == 0 and hi == n):
+                dist = (((self.area[lo:hi] - floor_area) / AREA_SCALE) ** 2
+                        + ((self.storey[lo:hi] - storey) / STOREY_SCALE) ** 2
+                        + ((self.lease[lo:hi] - lease) / LEASE_SCALE) ** 2)
+                best = np.argpartition(dist, k - 1)[:k] if k < len(dist) else np.arange(len(dist))
+                best = best[np.argsort(dist[best])]
+                # anything outside the window is at least (window / AREA_SCALE)^2 away, so the
+                # result is exact once the kth distance is within that
+                if dist[best[-1]] <= (window / AREA_SCALE) ** 2 or (lo == 0 and hi == n):
+                    break
+                window = AREA_SCALE * float(np.sqrt(dist[best[-1]])) + 1
+            else:
+                window *= 2
+
+        return [{
+            "month": str(self.month[i]),
+            "block": str(self.block[i]),
+            "street_name": str(self.street[i]),
+            "storey_range": str(self.storey_range[i]),
+            "floor_area_sqm": float(self.area[i]),
+            "remaining_lease": int(self.lease[i]),
+            "resale_price": int(self.price[i]),
+            "distance": round(float(np.sqrt(dist[j])), 3),
+        } for j, i in ((j, lo + j) for j in best)]
+
+# refreshing: one process per host (whoever holds the flock on snapshot_dir/refresh.lock)
+# polls the db and, when it changes, rebuilds the index and writes it to snapshot_dir as .npy
+# files. every worker, the refresher included, then memory-maps the newest snapshot, so after
+# a refresh the workers share one copy through the page cache instead of each building its own
+class ComparablesIndex:
+    def __init__(self, db_url: str, years: int = 3, refresh_seconds: float = 300, snapshot_dir: str = None):
+        from sqlalchemy import create_engine
+        self.engine = create_engine(db_url)
+        self.years = years
+        self.refresh_seconds = refresh_seconds
+        self.snapshot_dir = snapshot_dir
+        self.snapshot = None
+        self.data_ns = 0  # when the data we hold was read, so stale snapshots are skipped
+        self.lock_file = None
+        self.partitions = {}
+        self.version = None
+        self.rows = 0
+        self.built_at = None
+        self.build_seconds = None
+
+    def current_version(self):
+        from sqlalchemy import text
+        with self.engine.connect() as c:
+            return [str(v) for v in c.execute(text(VERSION_QUERY)).fetchone()]
+
+    def build(self):
+        from sqlalchemy import text
+        start = time.perf_counter()
+        data_ns = time.time_ns()
+        version = self.current_version()
+        with self.engine.connect() as c:
+            result = c.execute(text(ROWS_QUERY), {"years": self.years})
+            groups = {}
+            for r in result:
+                groups.setdefault((r.town, r.flat_type), []).append(
+                    (r.floor_area_sqm, r.storey_median, r.remaining_lease, r.resale_price,
+                     r.month, r.block, r.street_name, r.storey_range))
+
+        self.swap({key: Partition.from_rows(rows) for key, rows in groups.items()}, version)
+        self.data_ns = data_ns
+        self.build_seconds = time.perf_counter() - start
+        print(f"comparables index: {self.rows:,} sales in {len(self.partitions)} partitions ({self.build_seconds:.1f}s)")
+
+    def swap(self, partitions: dict, version):
+        # one assignment, queries see either the old or the new index
+        self.partitions = partitions
+        self.version = version
+        self.rows = sum(len(p.area) for p in partitions.values())
+        self.built_at = time.time()
+
+    def save_snapshot(self):
+        name = f"snap-{time.time_ns()}"
+        tmp = os.path.join(self.snapshot_dir, f".{name}")
+        os.makedirs(tmp)
+        keys = []
+        for i, (key, partition) in enumerate(self.partitions.items()):
+            keys.append([key[0], key[1], i])
+            for attr in ARRAYS:
+                np.save(os.path.join(tmp, f"{i}_{attr}.npy"), getattr(partition, attr))
+        with open(os.path.join(tmp, "manifest.json"), "w") as f:
+            json.dump({"version": self.version, "partitions": keys}, f)
+        os.replace(tmp, os.path.join(self.snapshot_dir, name))
+
+        with open(os.path.join(self.snapshot_dir, ".current"), "w") as f:
+            f.write(name)
+        os.replace(os.path.join(self.snapshot_dir, ".current"), os.path.join(self.snapshot_dir, "current"))
+
+        # workers still mapping an older snapshot keep their pages after the unlink
+        for old in os.listdir(self.snapshot_dir):
+            if old.startswith("snap-") and old != name:
+                shutil.rmtree(os.path.join(self.snapshot_dir, old), ignore_errors=True)
+
+    def load_snapshot(self):
+        try:
+            with open(os.path.join(self.snapshot_dir, "current")) as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return
+        if name == self.snapshot or int(name.split("-")[1]) <= self.data_ns:
+            return
+        path = os.path.join(self.snapshot_dir, name)
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        partitions = {
+            (town, flat_type): Partition({attr: np.load(os.path.join(path, f"{i}_{attr}.npy"), mmap_mode="r")
+                                          for attr in ARRAYS})
+            for town, flat_type, i in manifest["partitions"]
+        }
+        self.swap(partitions, manifest["version"])
+        self.snapshot = name
+        self.data_ns = int(name.split("-")[1])
+        print(f"comparables index: loaded snapshot {name} ({self.rows:,} sales)")
+
+    def is_refresher(self) -> bool:
+        if self.lock_file is None:
+            import fcntl
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            f = open(os.path.join(self.snapshot_dir, "refresh.lock"), "w")
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                return False  # another worker refreshes, retried next round in case it exits
+            self.lock_file = f  # held until this process exits
+        return True
+
+    def query(self, town: str, flat_type: str, floor_area: float, storey: float, lease: float, k: int = 5) -> list:
+        partition = self.partitions.get((town.upper(), flat_type.upper()))
+        if partition is None:
+            return []
+        return partition.nearest(floor_area, storey, lease, k)
+
+    def start_refresh(self):
+        # per worker, threads don't survive the fork
+        thread = threading.Thread(target=self.refresh_loop, daemon=True)
+        thread.start()
+
+    def refresh_loop(self):
+        while True:
+            time.sleep(self.refresh_seconds)
+            try:
+                if self.is_refresher() and self.current_version() != self.version:
+                    self.build()
+                    self.save_snapshot()
+                self.load_snapshot()
+            except Exception as e:
+                print(f"comparables refresh failed: {str(e)}")
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.rows,
+            "partitions": len(self.partitions),
+            "built_at": self.built_at,
+            "build_seconds": round(self.build_seconds, 2) if self.build_seconds else None,
+            "snapshot": self.snapshot,
+            "refresher": self.lock_file is not None,
+        }
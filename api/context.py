@@ -0,0 +1,129 @@
+# packs the chat function results into compact tables for the final llm call, under a
+# token budget. columns with the same value in every row are pulled out into one line,
+# and rows past the budget are summarised instead of sent
+import threading
+
+# overflow summaries keep these first, they are the figures the final answer is built on
+SUMMARY_PRIORITY = ["predicted_bto_price", "required_monthly_income", "predicted_resale_price",
+                    "monthly_payment", "town", "flat_type", "avg_price", "recent_transactions"]
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4  # ~4 chars per token, close enough for budgeting
+
+def fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.0f}" if value == int(value) else f"{value:.2f}"
+    return str(value)
+
+def compact_table(title: str, rows: list, budget_tokens: int, extra_common: dict = None) -> str:
+    if not rows:
+        return ""
+    columns = list(dict.fromkeys(k for row in rows for k in row))
+    common = dict(extra_common or {})
+    varying = []
+    for col in columns:
+        values = {fmt(row[col]) for row in rows if col in row}
+        if len(values) == 1 and len(rows) > 1:
+            common[col] = next(row[col] for row in rows if col in row)
+        else:
+            varying.append(col)
+
+    head = [f"{title}:"]
+    if common:
+        head.append("all rows: " + "; ".join(f"{k}={fmt(v)}" for k, v in common.items()))
+    if not varying:
+        return "\n".join(head) if estimate_tokens("\n".join(head)) <= budget_tokens else ""
+    head.append(" | ".join(varying))
+
+    lines = [" | ".join(fmt(row.get(col, "")) for col in varying) for row in rows]
+    fits = lambda parts: estimate_tokens("\n".join(parts)) <= budget_tokens
+    if fits(head + lines):
+        return "\n".join(head + lines)
+
+    # as many rows as fit next to the overflow summary, at least one if the table fits at all
+    shown = len(rows) - 1
+    while shown > 1 and not fits(head + lines[:shown] + [summarise_overflow(rows[shown:], varying)]):
+        shown -= 1
+    table = head + lines[:shown]
+    if not fits(table + [summarise_overflow(rows[shown:], varying, 0)]):
+        # not even one row fits, send the title and a summary of everything
+        shown, table = 0, [f"{title}:"]
+    room = budget_tokens - estimate_tokens("\n".join(table)) - 1
+    summary = summarise_overflow(rows[shown:], varying, room)
+    return "\n".join(table + [summary]) if fits(table + [summary]) else ""
+
+def summarise_overflow(rows: list, columns: list, max_tokens: int = None) -> str:
+    parts = []
+    rank = lambda col: SUMMARY_PRIORITY.index(col) if col in SUMMARY_PRIORITY else len(SUMMARY_PRIORITY)
+    for col in sorted(columns, key=rank):
+        values = [row[col] for row in rows if col in row]
+        numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        if numbers:
+            if min(numbers) != max(numbers):
+                parts.append(f"{col} {fmt(min(numbers))}-{fmt(max(numbers))}")
+            continue
+        distinct = list(dict.fromkeys(fmt(v) for v in values if v != ""))
+        if len(distinct) > 1:
+            parts.append(f"{col}: {', '.join(distinct[:5])}" + (" ..." if len(distinct) > 5 else ""))
+    # drop the lowest priority column summaries until it fits, the row count always stays
+    while parts and max_tokens is not None and estimate_tokens(f"(+{len(rows)} more rows not shown: {'; '.join(parts)})") > max_tokens:
+        parts.pop()
+    return f"(+{len(rows)} more rows not shown: {'; '.join(parts)})" if parts else f"(+{len(rows)} more rows not shown)"
+
+def build_context(system_prompt: str, recommendations: dict | None, predictions: list, budget_tokens: int) -> str:
+    # predictions carry their affordability fields, so price and scenario aren't repeated
+    sections = []
+    if recommendations:
+        rows = [{k: (round(v) if isinstance(v, float) else v) for k, v in rec.items()}
+                for rec in recommendations.get("recommendations", [])]
+        sections.append(("BTO Recommendations", rows, {"period_analysed": recommendations.get("period_analysed")}))
+    if predictions:
+        has_affordability = any("required_monthly_income" in p for p in predictions)
+        title = "BTO Price Analysis and Affordability" if has_affordability else "BTO Price Analysis"
+        priced = [{k: v for k, v in p.items() if k != "success"} for p in predictions if p.get("success")]
+        failed = [{k: v for k, v in p.items() if k != "success"} for p in predictions if not p.get("success")]
+        sections.append((title, priced, None))
+        sections.append(("Could not be priced", failed, None))
+    sections = [section for section in sections if section[1]]
+
+    if not sections:
+        return system_prompt
+
+    # the budget covers the whole context, sections share what the system prompt leaves and
+    # pass on whatever they don't use
+    intro = f"{system_prompt}\n\nAnalysis data:\n"
+    remaining = budget_tokens - estimate_tokens(intro)
+    blocks = []
+    for i, (title, rows, common) in enumerate(sections):
+        block = compact_table(title, rows, remaining // (len(sections) - i) - 1, common)
+        if block:
+            remaining -= estimate_tokens(block) + 1
+            blocks.append(block)
+    if not blocks:
+        return system_prompt
+    return intro + "\n\n".join(blocks)
+
+# prompt size of the final chat call, per worker
+class PromptStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.total_tokens = 0
+        self.max_tokens = 0
+        self.last_tokens = None
+
+    def record(self, tokens: int):
+        with self.lock:
+            self.requests += 1
+            self.total_tokens += tokens
+            self.max_tokens = max(self.max_tokens, tokens)
+            self.last_tokens = tokens
+
+    def report(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "avg_prompt_tokens": round(self.total_tokens / self.requests) if self.requests else None,
+                "max_prompt_tokens": self.max_tokens,
+                "last_prompt_tokens": self.last_tokens,
+            }
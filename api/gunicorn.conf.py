@@ -0,0 +1,40 @@
+# production serving: gunicorn master loads the model once, then forks uvicorn workers
+# that share it copy-on-write. run from the repo root with `make serve-prod`
+#
+#   WEB_CONCURRENCY  number of workers (default: cores // PREDICT_THREADS)
+#   PREDICT_THREADS  xgboost/BLAS threads per worker (default 1)
+#
+# pick both with `make bench-threads`, see README "Production Serving"
+import os, gc
+
+predict_threads = int(os.getenv("PREDICT_THREADS", "1"))
+os.environ["PREDICT_THREADS"] = str(predict_threads)
+
+# must be set before numpy/xgboost are imported (preload imports app after this file runs)
+for var in ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "NUMEXPR_NUM_THREADS"]:
+    os.environ[var] = str(predict_threads)
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", max(1, (os.cpu_count() or 1) // predict_threads)))
+worker_class = "uvicorn.workers.UvicornWorker"
+pythonpath = "api"
+wsgi_app = "app:app"
+preload_app = True
+timeout = 120
+
+def when_ready(server):
+    import app
+    app.load_resources()
+    if not app.LEAN_SERVING:
+        app.load_comparables()
+    # move everything loaded so far out of gc tracking so collections in the workers
+    # don't write to (and copy) the shared pages
+    gc.freeze()
+    server.log.info(f"model loaded, forking {workers} workers x {predict_threads} threads")
+
+def post_fork(server, worker):
+    import app
+    if app.llm_service and app.llm_service._engine:
+        app.llm_service._engine.dispose(close=False)  # pool from the master is not ours
+    if app.comparables_index:
+        app.comparables_index.engine.dispose(close=False)
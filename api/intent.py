@@ -0,0 +1,140 @@
+# deterministic fast path for the chat analysis step. produces the same intent JSON as the
+# LLM analysis call (needs_recommendations, prediction_scenarios, years, ...) for queries
+# that name their towns / flat types / floor levels explicitly, and returns None whenever
+# it isn't confident so chat falls back to the LLM
+import re, threading
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "fifteen": 15, "twenty": 20,
+}
+FLOOR_WORDS = {"low": "low", "lower": "low", "middle": "middle", "mid": "middle", "high": "high", "higher": "high"}
+
+RECOMMEND_RE = re.compile(r"\b(recommend\w*|limited (?:bto )?launch\w*|fewest|least (?:served|launches)|under-?served|which (?:towns?|estates?))\b")
+PRICE_RE = re.compile(r"\b(price[sd]?|cost[s]?|how much|valu\w+|worth)\b")
+AFFORD_RE = re.compile(r"\b(afford\w*|income|salary|earn|monthly payment|loan)\b")
+# phrasing the structured intent can't express, leave it to the llm
+UNSUPPORTED_RE = re.compile(r"\b(except|excluding|other than|not|no|don'?t|without|avoid\w*|instead of|compare[ds]?|versus|vs)\b")
+FLOOR_RE = re.compile(r"\b(low|lower|middle|mid|high|higher)\b(?=[\w\s,/-]{0,40}\b(floor|storey|level)s?\b)")
+AREA_RE = re.compile(r"\b(\d{2,3})\s*(?:sqm|sq\.? ?m|square met)")
+# only "past/last N years", so "60 years remaining lease" isn't read as the analysis period
+YEARS_RE = re.compile(r"\b(?:past|last|previous)\s+(\d{1,2}|" + "|".join(NUMBER_WORDS) + r")\s+years?\b")
+# "4 room", and lists like "3 and 4 room" / "3, 4 or 5-room", one flat type per digit
+ROOM_RE = re.compile(r"\b((?:\d\s*(?:,|and|or|&|/)\s*)*\d)[\s-]*(?:room|rm)s?\b")
+# an explicit storey, "30th floor" / "floor 12" / "12-storey"
+STOREY_RE = re.compile(r"\b(\d{1,2})(?:st|nd|rd|th)?[\s-]*(?:floor|storey)s?\b|\b(?:floor|storey|level)\s+(\d{1,2})\b")
+
+def storey_level(storey: int) -> str:
+    # same bands the analysis prompt gives the llm: low=1-5, middle=6-15, high=16+
+    if storey <= 5:
+        return "low"
+    return "middle" if storey <= 15 else "high"
+
+class IntentParser:
+    def __init__(self, towns, flat_types):
+        self.flat_types = {ft.upper() for ft in flat_types if ft}
+
+        # town names and the halves of combined names like KALLANG/WHAMPOA
+        aliases = {}
+        for town in filter(None, towns):
+            town = town.upper()
+            aliases[town.lower()] = town
+            for part in town.split("/"):
+                aliases.setdefault(part.strip().lower(), town)
+        names = sorted(aliases, key=len, reverse=True)  # longest first so "bukit batok" beats "bukit"
+        self.town_aliases = aliases
+        self.town_re = re.compile(r"\b(" + "|".join(re.escape(n) for n in names) + r")\b")
+
+    def parse(self, user_prompt: str) -> dict | None:
+        q = " ".join(user_prompt.lower().split())
+        if not q or UNSUPPORTED_RE.search(q):
+            return None
+
+        needs_recommendations = bool(RECOMMEND_RE.search(q))
+        needs_affordability = bool(AFFORD_RE.search(q))
+        towns = list(dict.fromkeys(self.town_aliases[m] for m in self.town_re.findall(q)))
+        flat_types = self.extract_flat_types(q)
+        needs_prediction = bool(PRICE_RE.search(q)) or needs_affordability or (bool(flat_types) and bool(towns))
+
+        if not (needs_recommendations or needs_prediction):
+            return None
+        if needs_prediction:
+            # a scenario needs a flat type and somewhere to price it
+            if not flat_types or not (towns or needs_recommendations):
+                return None
+
+        floor_levels = list(dict.fromkeys(
+            [FLOOR_WORDS[m[0]] for m in FLOOR_RE.findall(q)]
+            + [storey_level(int(a or b)) for a, b in STOREY_RE.findall(q)]
+        )) or ["middle"]
+        area = AREA_RE.search(q)
+        floor_area = int(area.group(1)) if area else 50
+
+        scenarios = []
+        if needs_prediction:
+            for flat_type in flat_types:
+                for town in towns or ["ALL"]:
+                    scenarios.append({
+                        "flat_type": flat_type,
+                        "town": town,
+                        "floor_levels": floor_levels,
+                        "floor_area_sqm": floor_area,
+                    })
+
+        return {
+            "reasoning": "parsed locally",
+            "needs_recommendations": needs_recommendations,
+            "needs_prediction": needs_prediction,
+            "needs_affordability": needs_affordability,
+            "prediction_scenarios": scenarios,
+            "years": self.extract_years(q),
+        }
+
+    def extract_flat_types(self, q: str) -> list:
+        found = [f"{n} ROOM" for group in ROOM_RE.findall(q) for n in re.findall(r"\d", group)]
+        if re.search(r"\bexec(utive)?\b", q):
+            found.append("EXECUTIVE")
+        if re.search(r"\bmulti[\s-]?gen(eration)?\b", q):
+            found.append("MULTI-GENERATION")
+        return [ft for ft in dict.fromkeys(found) if ft in self.flat_types]
+
+    def extract_years(self, q: str) -> int:
+        m = YEARS_RE.search(q)
+        if m:
+            n = m.group(1)
+            return int(n) if n.isdigit() else NUMBER_WORDS[n]
+        return 10
+
+# how often chat takes the fast path, and what the llm analysis calls it skipped cost
+class IntentStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fast_path = 0
+        self.fast_path_seconds = 0.0
+        self.llm = 0
+        self.llm_seconds = 0.0
+
+    def record(self, fast: bool, seconds: float):
+        with self.lock:
+            if fast:
+                self.fast_path += 1
+                self.fast_path_seconds += seconds
+            else:
+                self.llm += 1
+                self.llm_seconds += seconds
+
+    def report(self) -> dict:
+        with self.lock:
+            total = self.fast_path + self.llm
+            avg_llm = self.llm_seconds / self.llm if self.llm else None
+            avg_fast = self.fast_path_seconds / self.fast_path if self.fast_path else None
+            return {
+                "queries": total,
+                "fast_path": self.fast_path,
+                "llm_analysis": self.llm,
+                "fast_path_rate": round(self.fast_path / total, 3) if total else 0,
+                "avg_fast_path_ms": round(avg_fast * 1000, 3) if avg_fast is not None else None,
+                "avg_llm_analysis_ms": round(avg_llm * 1000, 1) if avg_llm is not None else None,
+                # estimated from the average llm analysis call seen by this worker
+                "estimated_saved_s": round(self.fast_path * (avg_llm - avg_fast), 1) if avg_llm and avg_fast is not None else None,
+            }
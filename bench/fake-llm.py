@@ -0,0 +1,90 @@
+# fake OpenAI-compatible chat completions server so load tests run offline and repeatably
+#   python3 bench/fake-llm.py --port 9000 --delay 0.5
+#   OPENROUTER_BASE_URL=http://localhost:9000/v1 make serve
+import re, json, time, random, argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+RECOMMENDATION_INTENT = {
+    "reasoning": "User wants towns with limited BTO launches",
+    "needs_recommendations": True,
+    "needs_prediction": False,
+    "needs_affordability": False,
+    "prediction_scenarios": [],
+    "years": 10,
+}
+
+PRICE_INTENT = {
+    "reasoning": "User wants a price and affordability estimate",
+    "needs_recommendations": False,
+    "needs_prediction": True,
+    "needs_affordability": True,
+    "prediction_scenarios": [
+        {"flat_type": "4 ROOM", "town": "TAMPINES", "floor_levels": ["low", "middle", "high"], "floor_area_sqm": 90}
+    ],
+    "years": 10,
+}
+
+SUMMARY = """## Price Analysis
+Predicted BTO prices are in the analysis data above.
+## Next Steps
+Check the latest HDB sales launch for exact units."""
+
+def completion(messages):
+    prompt = messages[-1]["content"] if messages else ""
+    if "Respond with ONLY this exact JSON" in prompt:
+        # the analysis call, answer with intent JSON the api can parse. only look at the
+        # user query line, the template's own examples mention "limited BTO launches"
+        query = re.search(r'^USER QUERY: "(.*)"$', prompt, re.MULTILINE)
+        limited = query is not None and "limited" in query.group(1).lower()
+        intent = RECOMMENDATION_INTENT if limited else PRICE_INTENT
+        return json.dumps(intent)
+    return SUMMARY
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        messages = body.get("messages", [])
+
+        time.sleep(max(0.0, self.server.delay + random.uniform(-self.server.jitter, self.server.jitter)))
+
+        content = completion(messages)
+        prompt_chars = sum(len(m.get("content", "")) for m in messages)
+        payload = json.dumps({
+            "id": f"fake-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_chars // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (prompt_chars + len(content)) // 4,
+            },
+        }).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=9000)
+    ap.add_argument("--delay", type=float, default=0.5, help="seconds per completion")
+    ap.add_argument("--jitter", type=float, default=0.0, help="+/- seconds added to delay")
+    args = ap.parse_args()
+
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), Handler)
+    server.delay, server.jitter = args.delay, args.jitter
+    print(f"fake llm on http://localhost:{args.port}/v1 (delay {args.delay}s)")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# replays a recorded request log, or a synthetic endpoint mix, against a running api and
+# reports latency percentiles and throughput per endpoint
+#   python3 bench/load-test.py --mix bto_price=8,bto_recommendations=1,chat=1 --requests 2000 --concurrency 32
+#   python3 bench/load-test.py --log requests.jsonl --rate 50 --out results/v2.json --compare results/v1.json
+#
+# log lines are JSON: {"method": "POST", "path": "/bto_price", "json": {...}}, or
+# {"path": "/chat", "body": "prompt"}. lines without a path (e.g. {"body": "..."}) replay as /chat prompts
+import os, json, time, random, argparse, threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+import numpy as np
+
+TOWNS = [
+    "ANG MO KIO", "BEDOK", "BISHAN", "BUKIT BATOK", "BUKIT MERAH", "BUKIT PANJANG",
+    "CHOA CHU KANG", "CLEMENTI", "HOUGANG", "JURONG WEST", "PASIR RIS", "PUNGGOL",
+    "QUEENSTOWN", "SEMBAWANG", "SENGKANG", "TAMPINES", "TOA PAYOH", "WOODLANDS", "YISHUN",
+]
+FLAT_TYPES = ["3 ROOM", "4 ROOM", "5 ROOM", "EXECUTIVE"]
+CHAT_PROMPTS = [
+    "Please recommend housing estates that have had limited BTO launches in the past ten years.",
+    "How much would a 4-room BTO flat cost in Tampines and what income do I need?",
+    "What are the BTO prospects and prices in Sengkang?",
+]
+
+def synthetic(endpoint, rng):
+    if endpoint == "bto_price":
+        return {"method": "POST", "path": "/bto_price", "json": {
+            "storey_median": rng.randint(1, 40),
+            "floor_area_sqm": rng.randint(40, 130),
+            "remaining_lease": rng.randint(50, 99),
+            "town": rng.choice(TOWNS),
+            "flat_type": rng.choice(FLAT_TYPES),
+        }}
+    if endpoint == "bto_recommendations":
+        return {"method": "GET", "path": "/bto_recommendations"}
+    if endpoint == "chat":
+        return {"method": "POST", "path": "/chat", "body": rng.choice(CHAT_PROMPTS)}
+    raise ValueError(f"unknown endpoint in mix: {endpoint}")
+
+def synthetic_requests(mix, n, seed):
+    rng = random.Random(seed)
+    weights = dict(part.split("=") for part in mix.split(","))
+    endpoints, w = list(weights), [float(x) for x in weights.values()]
+    return [synthetic(rng.choices(endpoints, w)[0], rng) for _ in range(n)]
+
+def load_log(path, n):
+    reqs = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            if "path" not in rec:
+                rec = {"method": "POST", "path": "/chat", "body": rec.get("body") or rec.get("prompt", "")}
+            rec.setdefault("method", "POST" if ("json" in rec or "body" in rec) else "GET")
+            reqs.append(rec)
+    # replayed once by default, --requests truncates or loops it to a target count
+    if n is not None and n > len(reqs):
+        reqs = [reqs[i % len(reqs)] for i in range(n)]
+    return reqs[:n] if n is not None else reqs
+
+local = threading.local()
+
+def send(base_url, req, timeout):
+    if not hasattr(local, "session"):
+        local.session = requests.Session()
+    kwargs = {"timeout": timeout}
+    if "json" in req:
+        kwargs["json"] = req["json"]
+    elif "body" in req:
+        kwargs["data"] = req["body"].encode("utf-8")
+        kwargs["headers"] = {"Content-Type": "text/plain"}
+    try:
+        r = local.session.request(req["method"], base_url + req["path"], **kwargs)
+        return r.status_code < 400
+    except requests.RequestException:
+        return False
+
+def run(base_url, reqs, concurrency, rate, timeout):
+    results = []  # (path, latency_s, ok)
+    lock = threading.Lock()
+
+    def one(req, scheduled):
+        sent = time.perf_counter()
+        ok = send(base_url, req, timeout)
+        # with --rate, latency counts from the scheduled send time so queueing isn't hidden
+        latency = time.perf_counter() - (scheduled if scheduled is not None else sent)
+        with lock:
+            results.append((req["path"], latency, ok))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, req in enumerate(reqs):
+            scheduled = None
+            if rate:
+                scheduled = start + i / rate
+                time.sleep(max(0.0, scheduled - time.perf_counter()))
+            pool.submit(one, req, scheduled)  # without --rate the pool keeps `concurrency` in flight
+    return results, time.perf_counter() - start
+
+def summarise(results, elapsed):
+    by_path = {}
+    for path, latency, ok in results:
+        by_path.setdefault(path, []).append((latency, ok))
+    by_path["ALL"] = [(latency, ok) for _, latency, ok in results]
+
+    report = {}
+    for path, rows in by_path.items():
+        ms = np.array([latency for latency, _ in rows]) * 1000
+        report[path] = {
+            "requests": len(rows),
+            "errors": sum(1 for _, ok in rows if not ok),
+            "rps": round(len(rows) / elapsed, 2),
+            "p50_ms": round(float(np.percentile(ms, 50)), 2),
+            "p95_ms": round(float(np.percentile(ms, 95)), 2),
+            "p99_ms": round(float(np.percentile(ms, 99)), 2),
+            "max_ms": round(float(ms.max()), 2),
+        }
+    return report
+
+def print_report(report, baseline=None):
+    print(f"{'endpoint':<22} {'reqs':>6} {'errs':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for path, r in report.items():
+        print(f"{path:<22} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+        if baseline and path in baseline:
+            b = baseline[path]
+            delta = lambda k: f"{(r[k] - b[k]) / b[k] * 100:+.0f}%" if b[k] else "n/a"
+            print(f"{'  vs baseline':<22} {'':>6} {'':>5} {delta('rps'):>8} {delta('p50_ms'):>9} {delta('p95_ms'):>9} {delta('p99_ms'):>9}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--base-url", default="http://0.0.0.0:8000")
+    ap.add_argument("--log", help="jsonl request log to replay")
+    ap.add_argument("--mix", default="bto_price=8,bto_recommendations=1,chat=1", help="synthetic endpoint weights")
+    ap.add_argument("--requests", type=int, help="requests to send (default: the whole --log once, or 1000 synthetic)")
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--rate", type=float, default=0, help="requests/s to send at, 0 = as fast as concurrency allows")
+    ap.add_argument("--timeout", type=float, default=120)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--out", help="write the report as json, to --compare against later")
+    ap.add_argument("--compare", help="report json from a previous run")
+    args = ap.parse_args()
+
+    if args.log:
+        reqs = load_log(args.log, args.requests)
+    else:
+        reqs = synthetic_requests(args.mix, args.requests or 1000, args.seed)
+    mode = f"{args.rate}/s" if args.rate else f"concurrency {args.concurrency}"
+    print(f"sending {len(reqs)} requests to {args.base_url} ({mode})")
+
+    results, elapsed = run(args.base_url, reqs, args.concurrency, args.rate, args.timeout)
+    report = summarise(results, elapsed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)["endpoints"]
+    print_report(report, baseline)
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({"args": vars(args), "elapsed_s": round(elapsed, 2), "endpoints": report}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks single-row xgboost predicts for every (workers, threads) split of the cores
+# so WEB_CONCURRENCY and PREDICT_THREADS can be picked for api/gunicorn.conf.py
+#   python3 bench/predict-threads.py --seconds 5
+import os, time, argparse
+import multiprocessing as mp
+import numpy as np
+import xgboost as xgb
+
+MODEL_PATH = os.path.join("model", "xgb_model.json")
+FEATURES = ["storey_median", "floor_area_sqm", "remaining_lease", "town_enc", "flat_type_enc"]
+
+def sample_rows(n, seed):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.integers(1, 40, n),     # storey_median
+        rng.integers(30, 150, n),   # floor_area_sqm
+        rng.integers(40, 99, n),    # remaining_lease
+        rng.integers(0, 26, n),     # town_enc
+        rng.integers(0, 7, n),      # flat_type_enc
+    ]).astype(np.float32)
+
+def run_worker(booster, worker_id, threads, seconds, out):
+    rows = sample_rows(1000, worker_id)
+
+    latencies = []
+    end = time.perf_counter() + seconds
+    i = 0
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        booster.predict(xgb.DMatrix(rows[i % len(rows)][None, :], feature_names=FEATURES, nthread=threads))
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    out.put(latencies)
+
+def bench(workers, threads, seconds):
+    # like make serve-prod: the parent loads the model (without predicting, so openmp
+    # isn't started before the fork) and forks workers that share it copy-on-write
+    booster = xgb.Booster()
+    booster.load_model(MODEL_PATH)
+    booster.set_param({"nthread": threads})
+
+    ctx = mp.get_context("fork")
+    out = ctx.Queue()
+    procs = [ctx.Process(target=run_worker, args=(booster, w, threads, seconds, out)) for w in range(workers)]
+    for p in procs:
+        p.start()
+    latencies = np.concatenate([out.get() for _ in procs])
+    for p in procs:
+        p.join()
+    return {
+        "workers": workers,
+        "threads": threads,
+        "preds_per_s": len(latencies) / seconds,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+    }
+
+def configs(cores):
+    threads = 1
+    while threads <= cores:
+        yield cores // threads, threads
+        threads *= 2
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=5.0)
+    ap.add_argument("--cores", type=int, default=os.cpu_count() or 1)
+    args = ap.parse_args()
+
+    results = []
+    print(f"{'workers':>8} {'threads':>8} {'preds/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for workers, threads in configs(args.cores):
+        r = bench(workers, threads, args.seconds)
+        results.append(r)
+        print(f"{r['workers']:>8} {r['threads']:>8} {r['preds_per_s']:>10.0f} {r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+    best = max(results, key=lambda r: r["preds_per_s"])
+    print(f"\nbest: WEB_CONCURRENCY={best['workers']} PREDICT_THREADS={best['threads']} make serve-prod")
+
+if __name__ == "__main__":
+    main()
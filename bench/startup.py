@@ -0,0 +1,90 @@
+# measures api import time, startup time, resident memory and single predict latency in a
+# fresh process, for the default and LEAN_SERVING modes. run from the repo root after `make train`
+#   python3 bench/startup.py --out bench/results/startup.json --compare bench/results/startup-prev.json
+import os, sys, json, argparse, subprocess
+
+HEAVY_MODULES = ["pandas", "openai", "sqlalchemy", "pyarrow"]
+
+# runs in the child process, reports one json line
+PROBE = """
+import os, sys, json, time, asyncio
+start = time.perf_counter()
+sys.path.insert(0, "api")
+import app
+imported = time.perf_counter()
+
+async def measure():
+    # the app's own lifespan, so startup work that depends on LEAN_SERVING (the
+    # comparables index and its db driver) is included
+    async with app.lifespan(app.app):
+        started = time.perf_counter()
+
+        data = app.PredictRequest(storey_median=10, floor_area_sqm=90, remaining_lease=99,
+                                  town=next(iter(app.town_mapping)), flat_type=next(iter(app.flat_type_mapping)))
+        app.predict_price(data)
+        n = 1000
+        t = time.perf_counter()
+        for _ in range(n):
+            app.predict_price(data)
+        predict_us = (time.perf_counter() - t) / n * 1e6
+
+        with open("/proc/self/status") as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS"))
+        heavy = [m for m in HEAVY_MODULES if m in sys.modules]
+
+    print(json.dumps({
+        "import_s": round(imported - start, 3),
+        "startup_s": round(started - imported, 3),
+        "rss_mb": round(rss_kb / 1024, 1),
+        "predict_price_us": round(predict_us, 1),
+        "heavy_modules_loaded": heavy,
+    }))
+
+asyncio.run(measure())
+"""
+
+def probe(lean: bool, repeats: int) -> dict:
+    env = dict(os.environ, LEAN_SERVING="1" if lean else "0")
+    runs = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", f"HEAVY_MODULES = {HEAVY_MODULES!r}\n" + PROBE],
+                             env=env, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    # best of n for timings, the os page cache makes the first run noisy
+    return {
+        "import_s": min(r["import_s"] for r in runs),
+        "startup_s": min(r["startup_s"] for r in runs),
+        "rss_mb": min(r["rss_mb"] for r in runs),
+        "predict_price_us": min(r["predict_price_us"] for r in runs),
+        "heavy_modules_loaded": runs[-1]["heavy_modules_loaded"],
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--out", help="write the report as json, to --compare against later")
+    ap.add_argument("--compare", help="report json from a previous run")
+    args = ap.parse_args()
+
+    report = {"default": probe(False, args.repeats), "lean": probe(True, args.repeats)}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+
+    metrics = ["import_s", "startup_s", "rss_mb", "predict_price_us"]
+    print(f"{'mode':<10} " + " ".join(f"{m:>18}" for m in metrics) + "  heavy modules")
+    for mode, r in report.items():
+        print(f"{mode:<10} " + " ".join(f"{r[m]:>18}" for m in metrics) + f"  {', '.join(r['heavy_modules_loaded']) or '-'}")
+        if baseline and mode in baseline:
+            b = baseline[mode]
+            print(f"{'  vs prev':<10} " + " ".join(f"{(r[m] - b[m]) / b[m] * 100 if b.get(m) else 0:>+17.0f}%" for m in metrics))
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,7 @@ load_dotenv()
 DB_URL     = os.getenv("DATABASE_URL")
 MODEL_PATH = os.path.join("model", "xgb_model.json")
 META_PATH  = os.path.join("model", "xgb_meta.json")
+MAPPINGS_PATH = os.path.join("model", "xgb_mappings.json")
 
 FEATURES = [
     "storey_median",
@@ -39,6 +40,17 @@ def load_data():
         df = pd.read_sql(q, c)
     return df
 
+def load_mappings():
+    # the encodings this model was trained on, so the api can load them without the db
+    eng = create_engine(DB_URL, future=True)
+    with eng.connect() as c:
+        towns = pd.read_sql("SELECT DISTINCT town, town_enc FROM transactions_clean WHERE town IS NOT NULL", c)
+        flats = pd.read_sql("SELECT DISTINCT flat_type, flat_type_enc FROM transactions_clean WHERE flat_type IS NOT NULL", c)
+    return {
+        "town": {t: int(e) for t, e in zip(towns["town"], towns["town_enc"])},
+        "flat_type": {f: int(e) for f, e in zip(flats["flat_type"], flats["flat_type_enc"])},
+    }
+
 def time_split(df: pd.DataFrame):
     train = df.sample(frac=0.7, random_state=42)
     remaining = df.drop(train.index)
@@ -128,9 +140,12 @@ def main():
         model.save_model(MODEL_PATH)
         with open(META_PATH, "w") as f:
             json.dump(metrics, f, indent=2)
+        with open(MAPPINGS_PATH, "w") as f:
+            json.dump(load_mappings(), f, indent=2)
         
         mlflow.log_artifact(MODEL_PATH)
         mlflow.log_artifact(META_PATH)
+        mlflow.log_artifact(MAPPINGS_PATH)
         
         print(f"MLflow run: {mlflow.active_run().info.run_id}")
 
@@ -1,3 +1,5 @@
+import io
+import csv as csv_module
 import requests
 
 def test_api():
@@ -46,6 +48,33 @@ def test_api():
     print(error_response.status_code)
 
     print(f"prediction ok")
+
+    print("bulk prediction test")
+    csv = (
+        "storey_median,floor_area_sqm,remaining_lease,town,flat_type\n"
+        "10,90,99,ANG MO KIO,4 ROOM\n"
+        "10,90,99,INVALID,4 ROOM\n"
+        "10,90,99,ANG MO KIO,4 ROOM,extra\n"
+        "10,90,99,\"ANG MO KIO,4 ROOM\n"  # unterminated quote
+    )
+    bulk_response = requests.post(f"{base_url}/bto_price/bulk", params={"chunk_size": 1},
+                                  files={"file": ("portfolio.csv", csv, "text/csv")})
+    assert bulk_response.status_code == 200
+    rows = list(csv_module.DictReader(io.StringIO(bulk_response.text)))
+    assert len(rows) == 4
+    assert rows[0]["error"] == "" and float(rows[0]["predicted_bto_price"]) > 0
+    assert rows[1]["error"] == "Unknown town"
+    assert rows[2]["error"].startswith("malformed row")
+    assert rows[3]["error"].startswith("malformed row")
+    print("bulk prediction ok")
+
+    print("comparables test")
+    comparables_response = requests.post(f"{base_url}/comparables", params={"k": 3}, json=test_data)
+    assert comparables_response.status_code == 200
+    sales = comparables_response.json()["comparables"]
+    assert 0 < len(sales) <= 3
+    assert sales == sorted(sales, key=lambda s: s["distance"])
+    print("comparables ok")
     
     print("api ok")
     # test can be more robust by checking more endpoints and responses thoroughly
@@ -0,0 +1,53 @@
+import os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from context import build_context, compact_table, estimate_tokens
+
+SYSTEM_PROMPT = "Create a CONCISE analysis (max 250 words) of BTO prices and affordability."
+TOWNS = ["ANG MO KIO", "BEDOK", "BUKIT BATOK", "PUNGGOL", "SENGKANG", "TAMPINES"]
+
+def prediction(i):
+    # the same shape chat() builds, storey and area are the same for every row
+    return {"storey_median": 8, "floor_area_sqm": 93.0, "remaining_lease": 95,
+            "town": TOWNS[i % len(TOWNS)], "flat_type": ["3 ROOM", "4 ROOM", "5 ROOM"][i % 3],
+            "predicted_resale_price": 500000.0 + 1000 * i, "predicted_bto_price": 300000.0 + 1000 * i,
+            "success": True, "floor_level": "middle", "monthly_payment": 1200.0 + 10 * i,
+            "required_monthly_income": 4000.0 + 30 * i, "income_category": "middle income"}
+
+RECOMMENDATIONS = {"period_analysed": "2015-2024", "recommendations": [
+    {"town": town, "bto_launches": 2, "recent_transactions": 100 + i, "avg_price": 450000.0 + i}
+    for i, town in enumerate(TOWNS)]}
+
+# budget -> number of predictions
+BUDGETS = [(50, 60), (100, 60), (150, 18), (200, 60), (400, 60), (1500, 18), (1500, 60)]
+
+def test_context_builder():
+    # repeated fields go in one line instead of every row
+    table = compact_table("BTO Price Analysis", [prediction(i) for i in range(6)], 1500)
+    assert "all rows: storey_median=8; floor_area_sqm=93; remaining_lease=95" in table, table
+    assert "storey_median" not in table.splitlines()[2], table
+    assert len(table.splitlines()) == 3 + 6, table
+
+    # a moderate budget still sends at least one row next to the summary
+    context = build_context(SYSTEM_PROMPT, None, [prediction(i) for i in range(18)], 150)
+    lines = context.splitlines()
+    header = lines.index("town | flat_type | predicted_resale_price | predicted_bto_price | "
+                         "monthly_payment | required_monthly_income")
+    assert lines[header + 1].startswith("ANG MO KIO | 3 ROOM"), context
+    assert "more rows not shown" in lines[-1], context
+
+    # the overflow summary keeps the figures the answer needs first
+    table = compact_table("BTO Price Analysis", [prediction(i) for i in range(60)], 60)
+    assert "predicted_bto_price" in table and "required_monthly_income" in table, table
+
+    for budget, count in BUDGETS:
+        context = build_context(SYSTEM_PROMPT, RECOMMENDATIONS, [prediction(i) for i in range(count)], budget)
+        assert estimate_tokens(context) <= budget, (budget, estimate_tokens(context), context)
+        assert context.startswith(SYSTEM_PROMPT), context
+
+    # a budget too small for the prompt itself sends just the prompt
+    assert build_context(SYSTEM_PROMPT, RECOMMENDATIONS, [prediction(0)], 10) == SYSTEM_PROMPT
+    print(f"context builder ok ({len(BUDGETS)} budgets)")
+
+if __name__ == "__main__":
+    test_context_builder()
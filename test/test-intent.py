@@ -0,0 +1,70 @@
+import os, sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from intent import IntentParser
+
+TOWNS = ["ANG MO KIO", "BEDOK", "BUKIT BATOK", "BUKIT MERAH", "CENTRAL AREA", "KALLANG/WHAMPOA",
+         "PUNGGOL", "SENGKANG", "TAMPINES"]
+FLAT_TYPES = ["2 ROOM", "3 ROOM", "4 ROOM", "5 ROOM", "EXECUTIVE"]
+
+# query -> None (left to the llm) or the fields the parsed intent must have
+CASES = [
+    ("Please recommend housing estates that have had limited BTO launches in the past ten years.",
+     {"needs_recommendations": True, "needs_prediction": False, "years": 10, "scenarios": []}),
+    ("Recommend estates with limited BTO launches over the last 5 years",
+     {"needs_recommendations": True, "years": 5}),
+    ("How much would a 4-room BTO flat cost in Tampines and what income do I need?",
+     {"needs_prediction": True, "needs_affordability": True,
+      "scenarios": [("4 ROOM", "TAMPINES", ["middle"], 50)]}),
+    ("Please recommend housing estates that have had limited BTO launches in the past ten years. "
+     "For each estate, provide an analysis of potential BTO prices for both 3-room and 4-room flats, "
+     "considering low, middle, and high floor levels.",
+     {"needs_recommendations": True, "needs_prediction": True,
+      "scenarios": [("3 ROOM", "ALL", ["low", "middle", "high"], 50), ("4 ROOM", "ALL", ["low", "middle", "high"], 50)]}),
+    ("Price of a 5 room high floor 110 sqm flat in Kallang and Bukit Batok",
+     {"scenarios": [("5 ROOM", "KALLANG/WHAMPOA", ["high"], 110), ("5 ROOM", "BUKIT BATOK", ["high"], 110)]}),
+    ("How much is an executive flat in central area?",
+     {"scenarios": [("EXECUTIVE", "CENTRAL AREA", ["middle"], 50)]}),
+    ("Should I buy a 4 room in central Tampines?",
+     {"scenarios": [("4 ROOM", "TAMPINES", ["middle"], 50)]}),
+    ("4 room price in Punggol with 60 years remaining lease",
+     {"years": 10, "scenarios": [("4 ROOM", "PUNGGOL", ["middle"], 50)]}),
+    ("How much are 3 and 4 room flats in Bedok?",
+     {"scenarios": [("3 ROOM", "BEDOK", ["middle"], 50), ("4 ROOM", "BEDOK", ["middle"], 50)]}),
+    ("price of 3, 4 or 5 room flat in Tampines",
+     {"scenarios": [("3 ROOM", "TAMPINES", ["middle"], 50), ("4 ROOM", "TAMPINES", ["middle"], 50),
+                    ("5 ROOM", "TAMPINES", ["middle"], 50)]}),
+    ("How much is a 4 room on the 30th floor in Punggol?",
+     {"scenarios": [("4 ROOM", "PUNGGOL", ["high"], 50)]}),
+    ("5-room flat price in Sengkang, floor 3",
+     {"scenarios": [("5 ROOM", "SENGKANG", ["low"], 50)]}),
+    # not confident: fall back to the llm
+    ("price of 4 room flats in bukit merah not bedok", None),
+    ("4 room prices anywhere except Sengkang", None),
+    ("3 room flat without a high floor in Bedok, how much?", None),
+    ("Compare prices between Sengkang and Punggol", None),
+    ("What are the BTO prospects and prices in Sengkang?", None),  # no flat type
+    ("How can I afford a 3-room flat", None),  # nowhere to price it
+    ("hello", None),
+    ("", None),
+]
+
+def test_intent_parser():
+    parser = IntentParser(TOWNS, FLAT_TYPES)
+    for query, expected in CASES:
+        intent = parser.parse(query)
+        if expected is None:
+            assert intent is None, f"{query!r}: expected llm fallback, got {intent}"
+            continue
+        assert intent is not None, f"{query!r}: expected a parsed intent"
+        for key, value in expected.items():
+            if key == "scenarios":
+                got = [(s["flat_type"], s["town"], s["floor_levels"], s["floor_area_sqm"])
+                       for s in intent["prediction_scenarios"]]
+                assert got == value, f"{query!r}: scenarios {got} != {value}"
+            else:
+                assert intent[key] == value, f"{query!r}: {key} {intent[key]} != {value}"
+    print(f"intent parser ok ({len(CASES)} cases)")
+
+if __name__ == "__main__":
+    test_intent_parser()